@@ -0,0 +1,305 @@
+"""
+Response caching for the Farkle backend.
+
+Read-heavy endpoints such as the leaderboard and player statistics only
+change when a game result is submitted or a player is removed, so their
+responses are cached with ``fastapi-cache2``.  Redis is used when the
+``REDIS_URL`` environment variable is set; otherwise an in-process memory
+backend is used, which is sufficient for local development and tests.
+
+List endpoints (leaderboard, user players) additionally use a
+stale-while-revalidate policy: once an entry goes stale it is still served
+while a background task refreshes it, and if the database fails the last
+good response is returned instead of an error.  These responses carry an
+``ETag`` so polling clients get ``304 Not Modified`` while nothing changed.
+Their keys include a per-namespace generation token; invalidating the
+namespace replaces the token, so older entries are never read again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+from uuid import UUID, uuid4
+
+from fastapi import BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHE_PREFIX = "farkle-cache"
+
+# Time-to-live policy (seconds).  Player statistics are expected to change
+# right after a game is played, so they are kept for a short time only.
+SHORT_TTL = 5
+NORMAL_TTL = 30
+# How long a stale entry is kept around as a fallback for database errors.
+FALLBACK_TTL = 3600
+# Generation tokens outlive every entry stored under them.  A token that
+# expires reads as the initial generation, whose entries are gone by then.
+GENERATION_TTL = FALLBACK_TTL * 24
+INITIAL_GENERATION = "0"
+
+LEADERBOARD_NAMESPACE = "leaderboard"
+PLAYER_STATS_NAMESPACE = "player_stats"
+USER_PLAYERS_NAMESPACE = "user_players"
+
+# Keys currently being refreshed in the background, to avoid piling up
+# duplicate refreshes while an entry is stale.
+_refreshing = set()
+
+
+def init_cache() -> None:
+    """Initialise the cache backend.  Call once on application startup."""
+    if REDIS_URL:
+        from fastapi_cache.backends.redis import RedisBackend
+        from redis import asyncio as aioredis
+
+        backend = RedisBackend(aioredis.from_url(REDIS_URL))
+    else:
+        backend = InMemoryBackend()
+    FastAPICache.init(backend, prefix=CACHE_PREFIX)
+
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    return ":".join([FastAPICache.get_prefix(), namespace, *map(str, parts)])
+
+
+def player_stats_key_builder(
+    func: Callable,
+    namespace: str = "",
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: tuple = (),
+    kwargs: Optional[dict] = None,
+) -> str:
+    """Key player statistics by player so they can be invalidated per player.
+
+    The default ``fastapi-cache2`` key builder hashes every argument of the
+    endpoint, including the database session, which would make every key
+    unique.
+    """
+    player_id = (kwargs or {}).get("player_id")
+    return cache_key(namespace, player_id, "stats")
+
+
+def _generation_key(namespace: str) -> str:
+    return cache_key(namespace, "generation")
+
+
+async def _generation(namespace: str) -> Optional[str]:
+    """Return the namespace's current generation, or None if unreadable."""
+    try:
+        raw = await FastAPICache.get_backend().get(_generation_key(namespace))
+    except Exception:
+        logger.warning("Error reading the %s cache generation", namespace, exc_info=True)
+        return None
+    if raw is None:
+        return INITIAL_GENERATION
+    return raw.decode() if isinstance(raw, bytes) else raw
+
+
+async def _next_generation(namespace: str) -> None:
+    backend = FastAPICache.get_backend()
+    previous = await _generation(namespace)
+    await backend.set(_generation_key(namespace), uuid4().hex, GENERATION_TTL)
+    if isinstance(backend, InMemoryBackend):
+        _prune_memory_store(backend, cache_key(namespace, previous or "") + ":")
+
+
+def _prune_memory_store(backend: InMemoryBackend, superseded: str) -> None:
+    """Drop expired entries and those under the ``superseded`` key prefix.
+
+    Redis expires keys itself, but the in-memory backend only drops an
+    expired key when it is read, and entries of a previous generation are
+    never read again.
+    """
+    now = time.time()
+    for key, value in list(backend._store.items()):
+        if key.startswith(superseded) or value.ttl_ts < now:
+            backend._store.pop(key, None)
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _entry_key(namespace: str, generation: str, parts: tuple) -> str:
+    # Parts may come from the request (e.g. a user ID), so they are hashed
+    # rather than embedded in the key.
+    encoded = json.dumps(parts, default=str).encode()
+    return cache_key(namespace, generation, _digest(encoded))
+
+
+def _etag(body: Any) -> str:
+    return _digest(json.dumps(body, separators=(",", ":"), sort_keys=True).encode())
+
+
+def _make_entry(body: Any, stale_after: int, expire_after: int) -> dict:
+    now = time.time()
+    body = jsonable_encoder(body)
+    return {
+        "generated_at": now,
+        "stale_at": now + stale_after,
+        "hard_expire_at": now + expire_after,
+        "status": 200,
+        "etag": _etag(body),
+        "body": body,
+    }
+
+
+async def _store(namespace: str, generation: str, key: str, entry: dict) -> None:
+    # Skip entries loaded before the namespace was invalidated.  One that
+    # slips through between the check and the write lands under the old
+    # generation, where no request looks.
+    if await _generation(namespace) != generation:
+        return
+    await FastAPICache.get_backend().set(key, json.dumps(entry), FALLBACK_TTL)
+
+
+async def _load(key: str) -> Optional[dict]:
+    try:
+        raw = await FastAPICache.get_backend().get(key)
+    except Exception:
+        logger.warning("Error reading cache key %s", key, exc_info=True)
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _respond(entry: dict, request: Request, response: Response) -> Any:
+    """Return the entry's body, or a 304 if the client already has it."""
+    etag = f'"{entry["etag"]}"'
+    max_age = max(0, int(entry["stale_at"] - time.time()))
+    headers = {"ETag": etag, "Cache-Control": f"max-age={max_age}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry["body"]
+
+
+async def _refresh(
+    namespace: str,
+    generation: str,
+    key: str,
+    loader: Callable[[AsyncSession], Awaitable[Any]],
+    stale_after: int,
+    expire_after: int,
+) -> None:
+    try:
+        # The request's session is closed by now, so refresh with a new one.
+        async with AsyncSessionLocal() as db:
+            body = await loader(db)
+        entry = _make_entry(body, stale_after, expire_after)
+        try:
+            await _store(namespace, generation, key, entry)
+        except Exception:
+            logger.warning("Error writing cache key %s", key, exc_info=True)
+    except SQLAlchemyError:
+        # Keep serving the stale entry; the next request will retry.
+        logger.warning("Background refresh of %s failed", key, exc_info=True)
+    finally:
+        _refreshing.discard(key)
+
+
+async def stale_while_revalidate(
+    namespace: str,
+    key_parts: tuple,
+    loader: Callable[[AsyncSession], Awaitable[Any]],
+    db: AsyncSession,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    stale_after: int = NORMAL_TTL,
+    expire_after: int = NORMAL_TTL * 4,
+) -> Any:
+    """Return ``await loader(db)`` through the cache.
+
+    The entry is keyed by ``key_parts`` within ``namespace``.  Fresh entries
+    are returned as-is.  Entries older than ``stale_after`` seconds are
+    returned immediately and refreshed in the background.  Once
+    ``expire_after`` seconds have passed the loader is run inline; if the
+    database raises, the expired entry is served rather than failing.
+
+    Responses carry an ``ETag`` computed once when the entry is stored and a
+    ``Cache-Control`` max-age of the time left until the entry goes stale.
+    A request whose ``If-None-Match`` matches gets an empty 304 response.
+    """
+    generation = await _generation(namespace)
+    if generation is None:
+        # Without the generation there is no telling which entries are
+        # current, so bypass the cache.
+        entry = _make_entry(await loader(db), stale_after, expire_after)
+        return _respond(entry, request, response)
+    key = _entry_key(namespace, generation, key_parts)
+    entry = await _load(key)
+    now = time.time()
+    if entry and now < entry["hard_expire_at"]:
+        if now >= entry["stale_at"] and key not in _refreshing:
+            _refreshing.add(key)
+            background_tasks.add_task(
+                _refresh, namespace, generation, key, loader, stale_after, expire_after
+            )
+        return _respond(entry, request, response)
+
+    try:
+        body = await loader(db)
+    except SQLAlchemyError:
+        if entry is None:
+            raise
+        logger.warning("Serving stale %s after database error", key, exc_info=True)
+        return _respond(entry, request, response)
+    entry = _make_entry(body, stale_after, expire_after)
+    try:
+        await _store(namespace, generation, key, entry)
+    except Exception:
+        logger.warning("Error writing cache key %s", key, exc_info=True)
+    return _respond(entry, request, response)
+
+
+async def _delete(key: str) -> None:
+    try:
+        await FastAPICache.get_backend().clear(key=key)
+    except KeyError:
+        # The in-memory backend raises for keys it does not hold.
+        pass
+
+
+# Invalidation runs after the write has been committed, so failures are
+# logged rather than raised: an error response would make clients retry a
+# write that already succeeded.  Entries missed this way expire with their
+# TTL.
+async def invalidate_players(player_ids: Iterable[UUID]) -> None:
+    """Drop every cached response that includes the given players."""
+    try:
+        await _next_generation(LEADERBOARD_NAMESPACE)
+        await _next_generation(USER_PLAYERS_NAMESPACE)
+        for player_id in set(player_ids):
+            await _delete(cache_key(PLAYER_STATS_NAMESPACE, player_id, "stats"))
+    except Exception:
+        logger.warning("Error invalidating cached player responses", exc_info=True)
+
+
+async def invalidate_user_players() -> None:
+    """Drop the cached player lists.
+
+    The lists of all users share one generation, so this is a single write
+    rather than a lookup of the affected user's entry.
+    """
+    try:
+        await _next_generation(USER_PLAYERS_NAMESPACE)
+    except Exception:
+        logger.warning("Error invalidating cached player lists", exc_info=True)
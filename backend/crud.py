@@ -12,103 +12,227 @@ from datetime import datetime
 from typing import List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import func, cast, Integer
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, case, cast, delete, select, update, Float
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .models import User, PlayerProfile, Game, GameResult
+from .schemas import GameResultEntry
 
-def create_player(db: Session, user_id: str, display_name: str) -> str:
+# Queries are built once at import time and executed with bound parameters,
+# so each statement is compiled once per dialect and then served from the
+# engine's compiled-statement cache on every request.
+#
+# Per-player aggregates are kept as running totals on ``PlayerProfile`` and
+# updated whenever a game result is stored, so reads never scan
+# ``game_results``.
+_PLAYER_STATS = (
+    select(
+        PlayerProfile.player_id,
+        PlayerProfile.display_name,
+        PlayerProfile.games_played,
+        PlayerProfile.wins,
+        PlayerProfile.total_points,
+        PlayerProfile.avg_score,
+        PlayerProfile.total_farkles,
+        PlayerProfile.high_score,
+    )
+    .where(PlayerProfile.player_id == bindparam("pid"))
+)
+
+_PLAYER_SUMMARY = select(
+    PlayerProfile.player_id,
+    PlayerProfile.display_name,
+    PlayerProfile.wins,
+    PlayerProfile.avg_score,
+    PlayerProfile.total_points,
+)
+
+# One statement per sort option, each ordered by an indexed column.  Only
+# players with at least one game are ranked.
+_LEADERBOARD = {
+    sort: (
+        _PLAYER_SUMMARY
+        .where(PlayerProfile.games_played > 0)
+        .order_by(expr.desc())
+        .limit(bindparam("limit"))
+    )
+    for sort, expr in {
+        "avg_score": PlayerProfile.avg_score,
+        "wins": PlayerProfile.wins,
+        "total_points": PlayerProfile.total_points,
+    }.items()
+}
+
+_USER_PLAYERS = _PLAYER_SUMMARY.where(PlayerProfile.user_id == bindparam("uid"))
+
+# Existence checks and deletes only touch the key column instead of loading
+# whole ORM objects.
+_USER_EXISTS = select(User.user_id).where(User.user_id == bindparam("uid"))
+
+_DETACH_PLAYER_RESULTS = (
+    update(GameResult.__table__)
+    .where(GameResult.__table__.c.player_id == bindparam("pid"))
+    .values(player_id=None)
+)
+
+_DELETE_PLAYER = delete(PlayerProfile.__table__).where(
+    PlayerProfile.__table__.c.player_id == bindparam("pid")
+)
+
+# Executed once per result row; bind names must differ from column names.
+# The right-hand sides all see the row's values from before the update.
+_ADD_RESULT_TO_PLAYER = (
+    update(PlayerProfile.__table__)
+    .where(PlayerProfile.__table__.c.player_id == bindparam("b_player_id"))
+    .values(
+        games_played=PlayerProfile.__table__.c.games_played + 1,
+        wins=PlayerProfile.__table__.c.wins + bindparam("b_won"),
+        total_points=PlayerProfile.__table__.c.total_points + bindparam("b_score"),
+        total_farkles=PlayerProfile.__table__.c.total_farkles + bindparam("b_farkles"),
+        avg_score=(
+            (cast(PlayerProfile.__table__.c.total_points, Float) + bindparam("b_score"))
+            / (PlayerProfile.__table__.c.games_played + 1)
+        ),
+        high_score=case(
+            (PlayerProfile.__table__.c.high_score < bindparam("b_score"), bindparam("b_score")),
+            else_=PlayerProfile.__table__.c.high_score,
+        ),
+    )
+)
+
+async def _ensure_user(db: AsyncSession, user_id: str) -> None:
+    """Insert an anonymous user unless one with ``user_id`` already exists.
+
+    On PostgreSQL and SQLite the existence check is folded into the insert
+    with ``ON CONFLICT DO NOTHING``; nothing is committed here.
+    """
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        if not await db.get(User, user_id):
+            db.add(User(user_id=user_id, login_type="anonymous"))
+            await db.flush()
+        return
+    await db.execute(
+        insert(User)
+        .values(user_id=user_id, login_type="anonymous")
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+
+
+async def create_player(db: AsyncSession, user_id: str, display_name: str) -> uuid.UUID:
     """Ensure the user exists and create a new player profile.
 
     If the user does not already exist, an anonymous user record is created.
+    Both rows are written in a single transaction.
     Returns the generated player_id.
     """
-    user = db.get(User, user_id)
-    if not user:
-        user = User(user_id=user_id, login_type="anonymous")
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-    # Create the player profile
-    player_id = str(uuid.uuid4())
-    profile = PlayerProfile(
+    await _ensure_user(db, user_id)
+    player_id = uuid.uuid4()
+    db.add(PlayerProfile(
         player_id=player_id,
-        user_id=user.user_id,
+        user_id=user_id,
         display_name=display_name,
-    )
-    db.add(profile)
-    db.commit()
-    db.refresh(profile)
+    ))
+    await db.commit()
     return player_id
 
-def delete_player(db: Session, player_id: str) -> bool:
+async def delete_player(db: AsyncSession, player_id: uuid.UUID) -> bool:
     """Delete a player profile by its ID.
 
-    This operation will remove the player profile from the database. If the
-    specified `player_id` does not exist, an HTTP 404 error will be raised.
+    This operation will remove the player profile from the database and
+    detach its game results.  Returns False if the specified `player_id` does
+    not exist.
     """
-    player = db.get(PlayerProfile, player_id)
-    if not player:
+    await db.execute(_DETACH_PLAYER_RESULTS, {"pid": player_id})
+    deleted = (await db.execute(_DELETE_PLAYER, {"pid": player_id})).rowcount
+    if not deleted:
+        await db.rollback()
         return False
-        
-    db.query(GameResult).filter_by(player_id=player_id) \
-        .update({"player_id": "Deleted Player"}, synchronize_session=False)
-    
-    db.delete(player)
-    db.commit() 
+    await db.commit()
     return True
 
-def create_game_result(
-    db: Session,
+async def create_game_result(
+    db: AsyncSession,
     user_id: str,
     played_at: Optional[datetime],
-    results: List,
-) -> str:
+    results: List[GameResultEntry],
+) -> uuid.UUID:
     """Create a game session and associated results.
 
-    ``results`` is a list of objects/dicts with keys ``player_id``, ``score``,
-    ``turns``, ``farkles`` and ``won``.  If the user or any referenced
-    player does not exist, an HTTPException is raised with a 404 status.
-    Returns the new ``game_id``.
+    ``results`` is a list of validated ``GameResultEntry`` models.  If the
+    user or any referenced player does not exist, an HTTPException is raised
+    with a 404 status.  Returns the new ``game_id``.
     """
-    user = db.get(User, user_id)
-    if not user:
+    if await db.scalar(_USER_EXISTS, {"uid": user_id}) is None:
         raise HTTPException(status_code=404, detail="User not found")
-    game_id = str(uuid.uuid4())
+
+    # Validate every referenced player with a single query.
+    player_ids = [res.player_id for res in results]
+    found = set(
+        (await db.scalars(
+            select(PlayerProfile.player_id).where(PlayerProfile.player_id.in_(player_ids))
+        )).all()
+    )
+    missing = set(player_ids) - found
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Player(s) {', '.join(sorted(map(str, missing)))} not found",
+        )
+
+    # PostgreSQL generates game and result IDs itself (gen_random_uuid());
+    # they are only generated here for other databases.
+    server_ids = db.bind.dialect.name == "postgresql"
     game = Game(
-        game_id=game_id,
-        user_id=user.user_id,
+        user_id=user_id,
         played_at=played_at or datetime.utcnow(),
     )
+    if not server_ids:
+        game.game_id = uuid.uuid4()
     db.add(game)
-    for res in results:
-        
-        player_id   = res.player_id
-        score       = res.score
-        turns       = res.turns
-        farkles     = res.farkles
-        won         = res.won
-        
-        player = db.get(PlayerProfile, player_id)
-        if not player:
-            raise HTTPException(status_code=404, detail=f"Player {player_id} not found")
-        
-        result = GameResult(
-            result_id   = str(uuid.uuid4()),
-            game_id     = game_id,
-            player_id   = player_id,
-            score       = score,
-            turns_taken = turns,
-            farkles     = farkles,
-            won         = won,
+    # Flushing inserts the game row, which its results reference, and fetches
+    # a server-generated game_id through RETURNING.
+    await db.flush()
+    game_id = game.game_id
+    if results:
+        rows = [
+            {
+                "game_id":     game_id,
+                "player_id":   res.player_id,
+                "score":       res.score,
+                "turns_taken": res.turns,
+                "farkles":     res.farkles,
+                "won":         res.won,
+            }
+            for res in results
+        ]
+        if not server_ids:
+            for row in rows:
+                row["result_id"] = uuid.uuid4()
+        # A Core insert skips the ORM unit of work: one compiled statement
+        # executed for all rows, no GameResult objects in the identity map.
+        await db.execute(GameResult.__table__.insert(), rows)
+        await db.execute(
+            _ADD_RESULT_TO_PLAYER,
+            [
+                {
+                    "b_player_id": res.player_id,
+                    "b_won":       int(res.won),
+                    "b_score":     res.score,
+                    "b_farkles":   res.farkles,
+                }
+                for res in results
+            ],
         )
-        db.add(result)
-        
-    db.commit()
+    await db.commit()
     return game_id
 
 
-def get_player_stats(db: Session, player_id: str) -> dict:
+async def get_player_stats(db: AsyncSession, player_id: uuid.UUID) -> dict:
     """Return aggregated statistics for a single player profile.
 
     Calculates number of games played, wins, total points, average score,
@@ -116,107 +240,64 @@ def get_player_stats(db: Session, player_id: str) -> dict:
     not exist, an HTTPException is raised.
     Returns a dictionary compatible with ``PlayerStatsResponse``.
     """
-    player = db.get(PlayerProfile, player_id)
-    if not player:
+    stats = (await db.execute(_PLAYER_STATS, {"pid": player_id})).one_or_none()
+    if stats is None:
         raise HTTPException(status_code=404, detail="Player not found")
-    stats = (
-        db.query(
-            func.count(GameResult.result_id).label("games_played"),
-            func.sum(cast(GameResult.won, Integer)).label("wins"),
-            func.sum(GameResult.score).label("total_points"),
-            func.avg(GameResult.score).label("avg_score"),
-            func.sum(GameResult.farkles).label("total_farkles"),
-            func.max(GameResult.score).label("high_score"),
-        )
-        .filter(GameResult.player_id == player_id)
-        .one()
-    )
-    games_played = stats.games_played or 0
-    avg_score = float(stats.avg_score) if stats.avg_score is not None else 0.0
     return {
-        "player_id": player.player_id,
-        "display_name": player.display_name,
-        "games_played": games_played,
-        "wins": int(stats.wins or 0),
-        "total_points": int(stats.total_points or 0),
-        "avg_score": avg_score,
-        "total_farkles": int(stats.total_farkles or 0),
-        "high_score": int(stats.high_score or 0),
+        "player_id": stats.player_id,
+        "display_name": stats.display_name,
+        "games_played": stats.games_played,
+        "wins": stats.wins,
+        "total_points": stats.total_points,
+        "avg_score": float(stats.avg_score),
+        "total_farkles": stats.total_farkles,
+        "high_score": stats.high_score,
     }
 
 
-def get_leaderboard(db: Session, sort: str, limit: int):
+async def get_leaderboard(db: AsyncSession, sort: str, limit: int):
     """Return a leaderboard sorted by the specified field.
 
-    The leaderboard includes all players aggregated across all games.  Sorting
+    The leaderboard includes every player who has played at least one game,
+    read from the running totals on the player profile.  Sorting
     options include average score, wins, and total points.  ``limit``
     restricts the number of rows returned.  Returns a list of dictionaries
     compatible with ``LeaderboardEntry``.
     """
-    aggregation = (
-        db.query(
-            PlayerProfile.player_id,
-            PlayerProfile.display_name,
-            func.sum(cast(GameResult.won, Integer)).label("wins"),
-            func.avg(GameResult.score).label("avg_score"),
-            func.sum(GameResult.score).label("total_points"),
-        )
-        .join(GameResult, PlayerProfile.player_id == GameResult.player_id)
-        .group_by(PlayerProfile.player_id, PlayerProfile.display_name)
-        .all()
-    )
-    sorted_list = sorted(
-        aggregation,
-        key=lambda row: (getattr(row, sort) or 0),
-        reverse=True,
-    )[:limit]
+    rows = (await db.execute(_LEADERBOARD[sort], {"limit": limit})).all()
     return [
         {
             "player_id": row.player_id,
             "display_name": row.display_name,
             "wins": int(row.wins or 0),
-            "avg_score": float(row.avg_score or 0.0),
+            "avg_score": float(row.avg_score),
             "total_points": int(row.total_points or 0),
         }
-        for row in sorted_list
+        for row in rows
     ]
 
 
 
-def get_user_players(db: Session, user_id: str):
+async def get_user_players(db: AsyncSession, user_id: str):
     """Return all player profiles associated with a given user.
 
     Each entry includes basic statistics (wins, average score, total points).
     Returns a list of dictionaries compatible with ``LeaderboardEntry``.  If
-    the user does not exist, an HTTPException is raised.
+    the user does not exist, an anonymous user record is created.
     """
-    user = db.get(User, user_id)
-    if not user:
-        # Create the user if not found
-        user = User(user_id=user_id, login_type="anonymous")
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        
-    results = (
-        db.query(
-            PlayerProfile.player_id,
-            PlayerProfile.display_name,
-            func.sum(cast(GameResult.won, Integer)).label("wins"),
-            func.avg(GameResult.score).label("avg_score"),
-            func.sum(GameResult.score).label("total_points"),
-        )
-        .join(GameResult, PlayerProfile.player_id == GameResult.player_id, isouter=True)
-        .filter(PlayerProfile.user_id == user_id)
-        .group_by(PlayerProfile.player_id, PlayerProfile.display_name)
-        .all()
-    )
+    results = (await db.execute(_USER_PLAYERS, {"uid": user_id})).all()
+    # Profiles reference their user, so the user only needs to be looked up
+    # (and created if not found) when no profiles were returned.  Concurrent
+    # first requests may both miss, so the insert tolerates an existing row.
+    if not results and await db.scalar(_USER_EXISTS, {"uid": user_id}) is None:
+        await _ensure_user(db, user_id)
+        await db.commit()
     return [
         {
             "player_id": row.player_id,
             "display_name": row.display_name,
             "wins": int(row.wins or 0),
-            "avg_score": float(row.avg_score or 0.0),
+            "avg_score": float(row.avg_score),
             "total_points": int(row.total_points or 0),
         }
         for row in results
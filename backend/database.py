@@ -1,17 +1,21 @@
 """
 Database configuration and session management.
 
-This module defines the SQLAlchemy engine, session factory and declarative
+This module defines the SQLAlchemy engines, session factories and declarative
 base used by the Farkle backend.  By centralising these definitions you can
 easily point the application at different databases by changing the
-``DATABASE_URL`` environment variable.  A helper function ``get_db`` is
-provided to yield a database session in FastAPI endpoints.
+``DATABASE_URL`` environment variable.  The API uses the async engine
+(``asyncpg`` on PostgreSQL, ``aiosqlite`` on SQLite) through ``get_db``;
+the synchronous engine is kept for the scripts in ``backend/scripts``.
 """
 
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 
 
 # Determine the database connection URL.  Default to a local SQLite file.  To
@@ -21,33 +25,92 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./farkle.db")
 
 # The ``connect_args`` are only required for SQLite.  They are ignored by
 # PostgreSQL.  Setting ``check_same_thread=False`` allows SQLAlchemy to use
-# threads in a development environment.
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+# threads in a development environment.  ``query_cache_size`` raises the
+# number of compiled statements kept per engine (default 500) so that the
+# CRUD queries are never evicted and recompiled.
+engine_options = {"query_cache_size": 1200}
+if DATABASE_URL.startswith("sqlite"):
+    engine_options["connect_args"] = {"check_same_thread": False}
+    if ":memory:" in DATABASE_URL or DATABASE_URL in ("sqlite://", "sqlite:///"):
+        # An in-memory database only exists for the lifetime of its
+        # connection, so every session must share the same one.
+        engine_options["poolclass"] = StaticPool
+elif DATABASE_URL.startswith("postgresql"):
+    # Check connections before use so that a database restart does not
+    # surface as errors mid-request, keep a pool large enough for the
+    # worker's concurrency, and recycle connections before server-side
+    # idle timeouts close them.
+    engine_options.update(
+        pool_pre_ping=True,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+        max_overflow=int(os.getenv("DB_POOL_OVERFLOW", "20")),
+        pool_recycle=1800,
+    )
+
+# Async drivers used by the API for each backend.
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _async_url(url: str):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}") if driver else url
+
+
+# aiosqlite defaults to NullPool for file databases, which would open a new
+# connection (and rerun the pragmas below, discarding the page cache) on
+# every request.  Pool them as the synchronous engine does.
+async_engine_options = dict(engine_options)
+if DATABASE_URL.startswith("sqlite") and "poolclass" not in engine_options:
+    async_engine_options["poolclass"] = AsyncAdaptedQueuePool
+
+engine = create_engine(DATABASE_URL, **engine_options)
+async_engine = create_async_engine(_async_url(DATABASE_URL), **async_engine_options)
+
+# SQLite tuning for development and small deployments.  WAL lets readers
+# proceed while a writer commits, ``synchronous=NORMAL`` is durable under
+# WAL with far fewer fsyncs, and the remaining pragmas give each connection
+# a 64 MiB page cache, 256 MiB of memory-mapped I/O and in-memory temp tables.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
 )
 
-# Configure the session factory.  We disable autocommit and autoflush so that
-# changes are only persisted when we explicitly commit.
+if DATABASE_URL.startswith("sqlite"):
+
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
+
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# Configure the session factories.  We disable autocommit and autoflush so
+# that changes are only persisted when we explicitly commit.  Async sessions
+# keep attributes loaded after commit, since a lazy refresh would need I/O.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False,
+)
 
 # Declarative base class for our ORM models.
 Base = declarative_base()
 
 
-def get_db():
-    """Yield a database session for FastAPI dependencies.
+async def get_db():
+    """Yield an async database session for FastAPI dependencies.
 
-    The session is committed and closed automatically when the request
-    finishes.  Use this dependency in path operations to access the
-    database.  Example::
+    The session is closed automatically when the request finishes.  Use this
+    dependency in path operations to access the database.  Example::
 
         @app.get("/items")
-        def read_items(db: Session = Depends(get_db)):
-            return db.query(Item).all()
+        async def read_items(db: AsyncSession = Depends(get_db)):
+            return (await db.scalars(select(Item))).all()
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
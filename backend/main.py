@@ -6,12 +6,29 @@ expose a RESTful API.  It intentionally contains minimal business logic;
 database interactions are delegated to ``crud.py``.
 """
 
+import os
+from contextlib import asynccontextmanager
 from typing import List
 from datetime import datetime
 
-from fastapi import Depends, FastAPI, HTTPException, Query
-
-from .database import Base, engine, get_db
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from fastapi_cache.decorator import cache
+from pydantic import UUID4
+
+from .cache import (
+    init_cache,
+    invalidate_players,
+    invalidate_user_players,
+    player_stats_key_builder,
+    stale_while_revalidate,
+    LEADERBOARD_NAMESPACE,
+    PLAYER_STATS_NAMESPACE,
+    USER_PLAYERS_NAMESPACE,
+    NORMAL_TTL,
+    SHORT_TTL,
+)
+from .database import Base, async_engine, get_db
 from .schemas import (
     PlayerCreateRequest,
     DeletePlayerRequest,
@@ -30,13 +47,32 @@ from .crud import (
     get_user_players,
 )
 
-Base.metadata.create_all(bind=engine)
+# Create missing tables on startup.  Deployments that manage the schema with
+# migration scripts can set AUTO_CREATE_TABLES=0 to skip the catalog lookups.
+AUTO_CREATE_TABLES = os.getenv("AUTO_CREATE_TABLES", "1") == "1"
 
-app = FastAPI(title="Farkle Backend", version="0.2.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_CREATE_TABLES:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    init_cache()
+    yield
+
+
+# orjson serialises the list-heavy leaderboard and player payloads
+# considerably faster than the standard library encoder.
+app = FastAPI(
+    title="Farkle Backend",
+    version="0.2.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 
 @app.post("/create-player", summary="Create a new player profile")
-def create_player_endpoint(
+async def create_player_endpoint(
     request: PlayerCreateRequest,
     db = Depends(get_db),
 ):
@@ -45,10 +81,12 @@ def create_player_endpoint(
     If the user doesn't already exist it will be created automatically.  Returns
     the newly created ``player_id``.
     """
-    return {"player_id": create_player(db, request.user_id, request.display_name)}
+    player_id = await create_player(db, request.user_id, request.display_name)
+    await invalidate_user_players()
+    return {"player_id": player_id}
 
 @app.post("/delete-player", response_model=DeletePlayerResponse, summary="Delete a player profile")
-def delete_player_endpoint(
+async def delete_player_endpoint(
     payload: DeletePlayerRequest,
     db = Depends(get_db),
 ):
@@ -57,11 +95,13 @@ def delete_player_endpoint(
     This operation will remove the player profile from the database. If the
     specified `player_id` does not exist, returns success=False.
     """
-    success = delete_player(db, payload.player_id) 
+    success = await delete_player(db, payload.player_id) 
+    if success:
+        await invalidate_players([payload.player_id])
     return DeletePlayerResponse(success=success)
 
 @app.post("/game-result", summary="Submit a completed game session")
-def post_game_result_endpoint(
+async def post_game_result_endpoint(
     request: GameResultRequest,
     db = Depends(get_db),
 ):
@@ -71,14 +111,14 @@ def post_game_result_endpoint(
     players.  Users and players must already exist; unknown ``player_id`` values
     will result in an HTTP 404.
     """
-    return {
-        "game_id": create_game_result(
-            db,
-            request.user_id,
-            request.played_at,
-            request.results,
-        )
-    }
+    game_id = await create_game_result(
+        db,
+        request.user_id,
+        request.played_at,
+        request.results,
+    )
+    await invalidate_players([res.player_id for res in request.results])
+    return {"game_id": game_id}
 
 
 @app.get(
@@ -86,12 +126,17 @@ def post_game_result_endpoint(
     response_model=PlayerStatsResponse,
     summary="Get aggregated stats for a player",
 )
-def player_stats_endpoint(
-    player_id: str = Query(..., description="ID of the player"),
+@cache(
+    expire=SHORT_TTL,
+    namespace=PLAYER_STATS_NAMESPACE,
+    key_builder=player_stats_key_builder,
+)
+async def player_stats_endpoint(
+    player_id: UUID4 = Query(..., description="ID of the player"),
     db = Depends(get_db),
 ):
     """Return aggregated statistics for a single player profile."""
-    return get_player_stats(db, player_id)
+    return await get_player_stats(db, player_id)
 
 
 @app.get(
@@ -99,7 +144,10 @@ def player_stats_endpoint(
     response_model=LeaderboardResponse,
     summary="Get leaderboard",
 )
-def leaderboard_endpoint(
+async def leaderboard_endpoint(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     sort: str = Query(
         "avg_score",
         description="Sort field: 'avg_score', 'wins', or 'total_points'",
@@ -109,8 +157,20 @@ def leaderboard_endpoint(
     db = Depends(get_db),
 ):
     """Return the leaderboard sorted by the specified field."""
-    data = get_leaderboard(db, sort, limit)
-    return {"rows": data}
+    async def load(db):
+        return {"rows": await get_leaderboard(db, sort, limit)}
+
+    return await stale_while_revalidate(
+        LEADERBOARD_NAMESPACE,
+        (sort, limit),
+        load,
+        db,
+        request,
+        response,
+        background_tasks,
+        stale_after=NORMAL_TTL,
+        expire_after=NORMAL_TTL * 4,
+    )
 
 
 @app.get(
@@ -118,13 +178,28 @@ def leaderboard_endpoint(
     response_model=PlayerInfoResponse,
     summary="List all players for a user",
 )
-def user_players_endpoint(
+async def user_players_endpoint(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
     user_id: str = Query(..., description="User ID to list players for"),
     db = Depends(get_db),
 ):
     """Return all player profiles associated with a given user."""
-    data = get_user_players(db, user_id)
-    return {"players": data}
+    async def load(db):
+        return {"players": await get_user_players(db, user_id)}
+
+    return await stale_while_revalidate(
+        USER_PLAYERS_NAMESPACE,
+        (user_id,),
+        load,
+        db,
+        request,
+        response,
+        background_tasks,
+        stale_after=SHORT_TTL,
+        expire_after=NORMAL_TTL,
+    )
 
 
 if __name__ == "__main__":
@@ -6,19 +6,53 @@ between users, player profiles, games, and game results.  The models
 are imported by the CRUD layer and by Alembic for future migrations.
 """
 
+import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL, Boolean, Column, DateTime, FetchedValue, Float, ForeignKey, Integer,
+    LargeBinary, String, event,
+)
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 
 from .database import Base
 
 
+class GUID(TypeDecorator):
+    """Platform-independent UUID column type.
+
+    Uses PostgreSQL's native ``UUID`` type and stores the 16 raw bytes as a
+    ``BLOB`` elsewhere.  Accepts ``uuid.UUID`` objects or their string form
+    and always returns ``uuid.UUID`` objects.
+    """
+
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(bytes=value)
+
+
 class User(Base):
     __tablename__ = "users"
     # A user can be identified by a Google Play Games ID or a locally generated
-    # UUID.  Using string columns avoids database-specific UUID types and
-    # keeps the code portable.
+    # UUID, so unlike the server-generated IDs below this stays a string.
     user_id: str = Column(String, primary_key=True, index=True)
     login_type: str = Column(String, nullable=False)
     created_at: datetime = Column(DateTime, default=datetime.utcnow)
@@ -29,10 +63,21 @@ class User(Base):
 
 class PlayerProfile(Base):
     __tablename__ = "player_profiles"
-    player_id: str = Column(String, primary_key=True, index=True)
+    player_id: uuid.UUID = Column(GUID, primary_key=True, index=True)
     user_id: str = Column(String, ForeignKey("users.user_id"), nullable=False)
     display_name: str = Column(String, nullable=False)
     created_at: datetime = Column(DateTime, default=datetime.utcnow)
+    # Running totals over the player's game results, maintained by
+    # ``crud.create_game_result`` so that stats and leaderboard reads do not
+    # have to aggregate ``game_results``.
+    games_played: int = Column(Integer, nullable=False, default=0, server_default="0")
+    wins: int = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    total_points: int = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    total_farkles: int = Column(Integer, nullable=False, default=0, server_default="0")
+    high_score: int = Column(Integer, nullable=False, default=0, server_default="0")
+    # Stored rather than computed so the default leaderboard sort can be
+    # served from an index.
+    avg_score: float = Column(Float, nullable=False, default=0.0, server_default="0", index=True)
     # Relationships
     user = relationship("User", back_populates="players")
     results = relationship("GameResult", back_populates="player", passive_deletes=True)
@@ -40,7 +85,9 @@ class PlayerProfile(Base):
 
 class Game(Base):
     __tablename__ = "games"
-    game_id: str = Column(String, primary_key=True, index=True)
+    # On PostgreSQL game and result IDs are generated by the database (see
+    # ``_uuid_server_defaults`` below); elsewhere the CRUD layer supplies them.
+    game_id: uuid.UUID = Column(GUID, primary_key=True, index=True, server_default=FetchedValue())
     user_id: str = Column(String, ForeignKey("users.user_id"), nullable=False)
     played_at: datetime = Column(DateTime, default=datetime.utcnow)
     # Relationships
@@ -50,9 +97,9 @@ class Game(Base):
 
 class GameResult(Base):
     __tablename__ = "game_results"
-    result_id: str = Column(String, primary_key=True, index=True)
-    game_id: str = Column(String, ForeignKey("games.game_id"), nullable=False)
-    player_id: str = Column(String,
+    result_id: uuid.UUID = Column(GUID, primary_key=True, index=True, server_default=FetchedValue())
+    game_id: uuid.UUID = Column(GUID, ForeignKey("games.game_id"), nullable=False)
+    player_id: uuid.UUID = Column(GUID,
                             ForeignKey("player_profiles.player_id", ondelete="SET NULL"),
                             nullable=True,
                             index=True)
@@ -63,3 +110,36 @@ class GameResult(Base):
     # Relationships
     game = relationship("Game", back_populates="results")
     player = relationship("PlayerProfile", back_populates="results")
+
+
+# PostgreSQL-only server defaults for generated IDs.  ``gen_random_uuid()``
+# is built in from PostgreSQL 13; older servers need the ``pgcrypto``
+# extension, which is only created there because doing so requires the
+# CREATE privilege on the database.  SQLite has no UUID generator, so the
+# columns are only marked as ``FetchedValue`` there and the IDs are
+# generated in Python.
+def _before_postgresql_13(ddl, target, bind, dialect, **kw):
+    version = dialect.server_version_info
+    return version is not None and version < (13,)
+
+
+def _uuid_server_defaults():
+    event.listen(
+        Base.metadata,
+        "before_create",
+        DDL("CREATE EXTENSION IF NOT EXISTS pgcrypto").execute_if(
+            dialect="postgresql", callable_=_before_postgresql_13
+        ),
+    )
+    for table, column in (("games", "game_id"), ("game_results", "result_id")):
+        event.listen(
+            Base.metadata.tables[table],
+            "after_create",
+            DDL(
+                f"ALTER TABLE {table} ALTER COLUMN {column} "
+                "SET DEFAULT gen_random_uuid()"
+            ).execute_if(dialect="postgresql"),
+        )
+
+
+_uuid_server_defaults()
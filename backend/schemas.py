@@ -8,8 +8,9 @@ automatic documentation generation in FastAPI.
 
 from datetime import datetime
 from typing import List, Optional
+from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import UUID4, BaseModel, Field
 
 
 class PlayerCreateRequest(BaseModel):
@@ -18,14 +19,14 @@ class PlayerCreateRequest(BaseModel):
 
 
 class DeletePlayerRequest(BaseModel):
-    player_id: str
+    player_id: UUID4
 
 class DeletePlayerResponse(BaseModel):
     success: bool
 
 
 class GameResultEntry(BaseModel):
-    player_id: str
+    player_id: UUID4
     score: int
     turns: int
     farkles: int
@@ -39,7 +40,7 @@ class GameResultRequest(BaseModel):
 
 
 class PlayerStatsResponse(BaseModel):
-    player_id: str
+    player_id: UUID
     display_name: str
     games_played: int
     wins: int
@@ -50,7 +51,7 @@ class PlayerStatsResponse(BaseModel):
 
 
 class PlayerInfoEntry(BaseModel):
-    player_id: str
+    player_id: UUID
     display_name: str
     wins: int
     avg_score: float
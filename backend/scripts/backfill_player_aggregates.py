@@ -0,0 +1,60 @@
+# backend/scripts/backfill_player_aggregates.py
+"""
+Add and populate the running totals on ``player_profiles``.
+
+Databases created before the aggregate columns existed are missing them, and
+``create_all`` never alters existing tables.  This script adds any missing
+columns and recomputes every player's totals from ``game_results``.  It also
+drops ``ix_game_results_player_metrics``, the covering index the totals
+replaced.  It is safe to run repeatedly.
+"""
+from sqlalchemy import Float, Integer, cast, func, inspect, select, text, update
+from backend.database import engine
+from backend.models import GameResult, PlayerProfile
+
+# Column name -> SQL type of the running totals.
+AGGREGATE_COLUMNS = {
+    "games_played": "INTEGER",
+    "wins": "INTEGER",
+    "total_points": "INTEGER",
+    "total_farkles": "INTEGER",
+    "high_score": "INTEGER",
+    "avg_score": "FLOAT",
+}
+
+
+def _total(expr):
+    return func.coalesce(
+        select(expr)
+        .where(GameResult.player_id == PlayerProfile.player_id)
+        .scalar_subquery(),
+        0,
+    )
+
+
+def backfill():
+    existing = {c["name"] for c in inspect(engine).get_columns("player_profiles")}
+    with engine.begin() as conn:
+        for name, sql_type in AGGREGATE_COLUMNS.items():
+            if name not in existing:
+                conn.execute(text(
+                    f"ALTER TABLE player_profiles "
+                    f"ADD COLUMN {name} {sql_type} NOT NULL DEFAULT 0"
+                ))
+        conn.execute(text("DROP INDEX IF EXISTS ix_game_results_player_metrics"))
+        conn.execute(
+            update(PlayerProfile).values(
+                games_played=_total(func.count(GameResult.result_id)),
+                wins=_total(func.sum(cast(GameResult.won, Integer))),
+                total_points=_total(func.sum(GameResult.score)),
+                total_farkles=_total(func.sum(GameResult.farkles)),
+                high_score=_total(func.max(GameResult.score)),
+                avg_score=_total(func.avg(cast(GameResult.score, Float))),
+            )
+        )
+    for index in PlayerProfile.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    print("Backfilled player aggregates.")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,123 @@
+# backend/scripts/migrate_uuid_columns.py
+"""
+Convert string ID columns to the ``GUID`` type for existing databases.
+
+``player_id``, ``game_id`` and ``result_id`` used to be stored as 36-character
+strings.  They are now native ``UUID`` columns on PostgreSQL and 16-byte
+``BLOB`` columns on SQLite.  ``create_all`` never alters existing tables, so
+databases created before the change need this script.
+
+Result rows whose ``player_id`` is not a UUID (rows of deleted players were
+previously re-pointed at a ``"Deleted Player"`` placeholder) get a NULL
+``player_id``, which is what deleting a player now does.  The per-player
+running totals are recomputed at the end.  On PostgreSQL the script also
+installs the ``gen_random_uuid()`` defaults for game and result IDs.
+"""
+import uuid
+
+from sqlalchemy import MetaData, String, Table, inspect, text
+from backend.database import Base, engine
+from backend.models import GUID, GameResult, Game, PlayerProfile
+from backend.scripts.backfill_player_aggregates import backfill
+
+# Tables with GUID columns, in foreign-key dependency order.
+TABLES = [PlayerProfile.__table__, Game.__table__, GameResult.__table__]
+
+
+def _needs_migration():
+    columns = inspect(engine).get_columns("player_profiles")
+    player_id = next(c for c in columns if c["name"] == "player_id")
+    return isinstance(player_id["type"], String)
+
+
+def _to_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _migrate_postgresql():
+    fks = inspect(engine).get_foreign_keys("game_results")
+    with engine.begin() as conn:
+        for fk in fks:
+            conn.execute(text(f'ALTER TABLE game_results DROP CONSTRAINT "{fk["name"]}"'))
+        conn.execute(text(
+            "UPDATE game_results SET player_id = NULL WHERE player_id !~* "
+            "'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'"
+        ))
+        for table in TABLES:
+            for column in table.columns:
+                if isinstance(column.type, GUID):
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                        f"TYPE uuid USING {column.name}::uuid"
+                    ))
+        conn.execute(text(
+            "ALTER TABLE game_results ADD FOREIGN KEY (game_id) "
+            "REFERENCES games (game_id)"
+        ))
+        conn.execute(text(
+            "ALTER TABLE game_results ADD FOREIGN KEY (player_id) "
+            "REFERENCES player_profiles (player_id) ON DELETE SET NULL"
+        ))
+
+
+def _migrate_sqlite():
+    # SQLite cannot change a column's type, so each table is rebuilt: the old
+    # tables are renamed out of the way, recreated from the models and the
+    # rows copied across with their IDs converted.
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in TABLES:
+            for index in inspector.get_indexes(table.name):
+                conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+            conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+        Base.metadata.create_all(bind=conn)
+        for table in TABLES:
+            old_table = Table(f"{table.name}_old", MetaData(), autoload_with=conn)
+            old_columns = set(old_table.columns.keys())
+            guid_columns = [c.name for c in table.columns if isinstance(c.type, GUID)]
+            rows = [dict(row) for row in conn.execute(old_table.select()).mappings()]
+            for row in rows:
+                for name in guid_columns:
+                    if row[name] is not None:
+                        row[name] = _to_uuid(row[name])
+            if rows:
+                copied = [c.name for c in table.columns if c.name in old_columns]
+                conn.execute(
+                    table.insert(),
+                    [{name: row[name] for name in copied} for row in rows],
+                )
+        for table in reversed(TABLES):
+            conn.execute(text(f"DROP TABLE {table.name}_old"))
+
+
+def _set_postgresql_server_defaults():
+    # Tables created before game and result IDs were generated by the
+    # database lack the gen_random_uuid() defaults that create_all now adds.
+    with engine.begin() as conn:
+        # Built in from PostgreSQL 13; provided by pgcrypto before that.
+        if conn.dialect.server_version_info < (13,):
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pgcrypto"))
+        for table, column in (("games", "game_id"), ("game_results", "result_id")):
+            conn.execute(text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT gen_random_uuid()"
+            ))
+
+
+def migrate():
+    if not _needs_migration():
+        print("ID columns already use UUIDs.")
+    else:
+        if engine.dialect.name == "postgresql":
+            _migrate_postgresql()
+        else:
+            _migrate_sqlite()
+        backfill()
+        print("Converted ID columns to UUIDs.")
+    if engine.dialect.name == "postgresql":
+        _set_postgresql_server_defaults()
+
+if __name__ == "__main__":
+    migrate()
@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime
 from backend.database import SessionLocal, engine
 from backend.models import Base, User, PlayerProfile, Game, GameResult
+from backend.scripts.backfill_player_aggregates import backfill
 
 Base.metadata.create_all(bind=engine)
 db = SessionLocal()
@@ -14,7 +15,7 @@ def seed():
 
     player_ids = []
     for name in ["Alice", "Bob"]:
-        pid = str(uuid.uuid4())
+        pid = uuid.uuid4()
         player_ids.append(pid)
         profile = PlayerProfile(
             player_id=pid,
@@ -23,12 +24,12 @@ def seed():
         )
         db.add(profile)
 
-    game_id = str(uuid.uuid4())
+    game_id = uuid.uuid4()
     game = Game(game_id=game_id, user_id=user_id, played_at=datetime.utcnow())
     db.add(game)
 
     result1 = GameResult(
-        result_id=str(uuid.uuid4()),   # Add this line
+        result_id=uuid.uuid4(),
         game_id=game_id,
         player_id=player_ids[0],
         score=9800,
@@ -37,7 +38,7 @@ def seed():
         won=True
     )
     result2 = GameResult(
-        result_id=str(uuid.uuid4()),   # Add this line
+        result_id=uuid.uuid4(),
         game_id=game_id,
         player_id=player_ids[1],
         score=8700,
@@ -48,6 +49,8 @@ def seed():
 
     db.add_all([result1, result2])
     db.commit()
+    # Results were inserted directly, so refresh the players' running totals.
+    backfill()
     print("Seeded dev data with players and game session.")
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+# backend/tests/conftest.py
+import atexit
+import os
+import shutil
+import tempfile
+
+# The engines read DATABASE_URL when backend.database is imported, so point
+# the tests at a throwaway database before any test module imports the app.
+# Set TEST_DATABASE_URL to run the suite against another database.
+_tmpdir = tempfile.mkdtemp(prefix="farkle-tests-")
+atexit.register(shutil.rmtree, _tmpdir, ignore_errors=True)
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{_tmpdir}/farkle_test.db"
+)
+# Cache in process memory rather than in a shared Redis.
+os.environ.pop("REDIS_URL", None)
@@ -0,0 +1,136 @@
+# backend/tests/test_cache.py
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from backend import cache
+from backend.cache import init_cache, stale_while_revalidate
+
+STALE_AFTER = 10
+EXPIRE_AFTER = 60
+
+
+@pytest.fixture(autouse=True)
+def cache_backend():
+    init_cache()
+
+
+@pytest.fixture
+def namespace():
+    # The in-memory backend is shared, so each test gets its own namespace.
+    return f"test-{uuid.uuid4().hex}"
+
+
+def loader_returning(body):
+    async def load(db):
+        return body
+    return load
+
+
+async def failing_loader(db):
+    raise OperationalError("SELECT 1", {}, Exception("database is down"))
+
+
+def fetch(namespace, loader, background_tasks=None):
+    return asyncio.run(stale_while_revalidate(
+        namespace,
+        ("rows",),
+        loader,
+        None,
+        Request({"type": "http", "headers": []}),
+        Response(),
+        background_tasks or BackgroundTasks(),
+        stale_after=STALE_AFTER,
+        expire_after=EXPIRE_AFTER,
+    ))
+
+
+def advance_clock(monkeypatch, seconds):
+    now = time.time() + seconds
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: now))
+
+
+def test_fresh_entry_is_served_without_loading(namespace):
+    assert fetch(namespace, loader_returning({"v": 1})) == {"v": 1}
+    assert fetch(namespace, failing_loader) == {"v": 1}
+
+
+def test_stale_entry_is_served_and_refreshed(namespace, monkeypatch):
+    fetch(namespace, loader_returning({"v": 1}))
+    advance_clock(monkeypatch, STALE_AFTER + 1)
+    tasks = BackgroundTasks()
+    assert fetch(namespace, loader_returning({"v": 2}), tasks) == {"v": 1}
+    assert len(tasks.tasks) == 1
+    asyncio.run(tasks())
+    assert fetch(namespace, failing_loader) == {"v": 2}
+
+
+def test_failed_refresh_keeps_stale_entry(namespace, monkeypatch):
+    fetch(namespace, loader_returning({"v": 1}))
+    advance_clock(monkeypatch, STALE_AFTER + 1)
+    tasks = BackgroundTasks()
+    assert fetch(namespace, failing_loader, tasks) == {"v": 1}
+    asyncio.run(tasks())
+    assert fetch(namespace, failing_loader) == {"v": 1}
+
+
+def test_expired_entry_is_served_when_database_fails(namespace, monkeypatch):
+    fetch(namespace, loader_returning({"v": 1}))
+    advance_clock(monkeypatch, EXPIRE_AFTER + 1)
+    tasks = BackgroundTasks()
+    assert fetch(namespace, failing_loader, tasks) == {"v": 1}
+    assert not tasks.tasks
+
+
+def test_database_error_without_entry_is_raised(namespace):
+    with pytest.raises(OperationalError):
+        fetch(namespace, failing_loader)
+
+
+def test_refresh_started_before_invalidation_is_discarded(namespace, monkeypatch):
+    fetch(namespace, loader_returning({"v": 1}))
+    advance_clock(monkeypatch, STALE_AFTER + 1)
+    tasks = BackgroundTasks()
+    fetch(namespace, loader_returning({"v": "before write"}), tasks)
+    # A write lands while the refresh is still running.
+    asyncio.run(cache._next_generation(namespace))
+    asyncio.run(tasks())
+    assert fetch(namespace, loader_returning({"v": "after write"})) == {"v": "after write"}
+
+
+def test_invalidation_drops_previous_generation_from_memory(namespace):
+    for parts in ("a", "b"):
+        asyncio.run(stale_while_revalidate(
+            namespace,
+            (parts,),
+            loader_returning({"v": parts}),
+            None,
+            Request({"type": "http", "headers": []}),
+            Response(),
+            BackgroundTasks(),
+        ))
+    asyncio.run(cache._next_generation(namespace))
+    keys = [key for key in InMemoryBackend._store if f":{namespace}:" in key]
+    assert keys == [cache._generation_key(namespace)]
+
+
+def test_refresh_survives_cache_write_failure(namespace, monkeypatch):
+    fetch(namespace, loader_returning({"v": 1}))
+    advance_clock(monkeypatch, STALE_AFTER + 1)
+    tasks = BackgroundTasks()
+    fetch(namespace, loader_returning({"v": 2}), tasks)
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("cache backend is down")
+
+    monkeypatch.setattr(cache, "_store", unavailable)
+    asyncio.run(tasks())
+    assert not [key for key in cache._refreshing if namespace in key]
@@ -1,9 +1,24 @@
 # backend/tests/test_endpoints.py
+import uuid
+
+import pytest
 from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from sqlalchemy import event, select
+from backend.database import SessionLocal, async_engine
 from backend.main import app
+from backend.models import GameResult
 
 client = TestClient(app)
 
+
+@pytest.fixture(scope="module", autouse=True)
+def run_lifespan():
+    # Entering the client runs the app's startup/shutdown hooks.
+    with client:
+        yield
+
+
 def test_create_player():
     res = client.post("/create-player", json={
         "user_id": "test-user-1",
@@ -43,3 +58,226 @@ def test_post_game_result():
     })
     assert game_res.status_code == 200
     assert "game_id" in game_res.json()
+
+def test_leaderboard_sorted_and_limited():
+    res = client.get("/leaderboard", params={"sort": "total_points", "limit": 2})
+    assert res.status_code == 200
+    rows = res.json()["rows"]
+    assert len(rows) <= 2
+    points = [row["total_points"] for row in rows]
+    assert points == sorted(points, reverse=True)
+
+def test_player_stats_invalidated_after_game_result():
+    user_id = "test-user-3"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Cached"
+    }).json()["player_id"]
+
+    before = client.get("/player-stats", params={"player_id": player_id})
+    assert before.json()["games_played"] == 0
+
+    client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": player_id,
+            "score": 5000,
+            "turns": 7,
+            "farkles": 1,
+            "won": True
+        }]
+    })
+    after = client.get("/player-stats", params={"player_id": player_id})
+    assert after.json()["games_played"] == 1
+
+def test_user_players_includes_new_player():
+    user_id = "test-user-4"
+    assert client.get("/user-players", params={"user_id": user_id}).status_code == 200
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Listed"
+    }).json()["player_id"]
+    players = client.get("/user-players", params={"user_id": user_id}).json()["players"]
+    assert player_id in [p["player_id"] for p in players]
+
+def test_post_game_result_unknown_player():
+    user_id = "test-user-2"
+    missing_id = str(uuid.uuid4())
+    client.post("/create-player", json={"user_id": user_id, "display_name": "Known"})
+    game_res = client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": missing_id,
+            "score": 100,
+            "turns": 3,
+            "farkles": 0,
+            "won": False
+        }]
+    })
+    assert game_res.status_code == 404
+    assert missing_id in game_res.json()["detail"]
+
+def test_player_stats_unknown_player():
+    res = client.get("/player-stats", params={"player_id": str(uuid.uuid4())})
+    assert res.status_code == 404
+    res = client.get("/player-stats", params={"player_id": "not-a-uuid"})
+    assert res.status_code == 422
+
+def test_player_stats_running_totals():
+    user_id = "test-user-5"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Totals"
+    }).json()["player_id"]
+    for score, farkles, won in [(4000, 2, False), (9000, 1, True)]:
+        client.post("/game-result", json={
+            "user_id": user_id,
+            "results": [{
+                "player_id": player_id,
+                "score": score,
+                "turns": 8,
+                "farkles": farkles,
+                "won": won
+            }]
+        })
+    stats = client.get("/player-stats", params={"player_id": player_id}).json()
+    assert stats["games_played"] == 2
+    assert stats["wins"] == 1
+    assert stats["total_points"] == 13000
+    assert stats["avg_score"] == 6500.0
+    assert stats["total_farkles"] == 3
+    assert stats["high_score"] == 9000
+
+def test_game_result_loss_is_persisted():
+    user_id = "test-user-6"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Loser"
+    }).json()["player_id"]
+    res = client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": player_id,
+            "score": 0,
+            "turns": 5,
+            "farkles": 0,
+            "won": False
+        }]
+    })
+    assert res.status_code == 200
+    stats = client.get("/player-stats", params={"player_id": player_id}).json()
+    assert stats["games_played"] == 1
+    assert stats["wins"] == 0
+    assert stats["total_points"] == 0
+    with SessionLocal() as db:
+        won = db.scalars(
+            select(GameResult.won).where(GameResult.player_id == uuid.UUID(player_id))
+        ).all()
+    assert won == [False]
+
+def test_create_player_for_existing_user():
+    user_id = "test-user-7"
+    first = client.post("/create-player", json={"user_id": user_id, "display_name": "One"})
+    second = client.post("/create-player", json={"user_id": user_id, "display_name": "Two"})
+    assert first.status_code == 200 and second.status_code == 200
+    players = client.get("/user-players", params={"user_id": user_id}).json()["players"]
+    assert {p["display_name"] for p in players} >= {"One", "Two"}
+
+def test_delete_player_removes_from_leaderboard():
+    user_id = "test-user-8"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Gone"
+    }).json()["player_id"]
+    client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": player_id,
+            "score": 99999,
+            "turns": 5,
+            "farkles": 0,
+            "won": True
+        }]
+    })
+    assert client.post("/delete-player", json={"player_id": player_id}).json()["success"]
+    assert not client.post("/delete-player", json={"player_id": player_id}).json()["success"]
+    rows = client.get("/leaderboard", params={"sort": "total_points"}).json()["rows"]
+    assert player_id not in [row["player_id"] for row in rows]
+    assert client.get("/player-stats", params={"player_id": player_id}).status_code == 404
+
+def test_leaderboard_etag_not_modified():
+    first = client.get("/leaderboard", params={"sort": "wins", "limit": 5})
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("max-age=")
+    second = client.get(
+        "/leaderboard",
+        params={"sort": "wins", "limit": 5},
+        headers={"If-None-Match": etag},
+    )
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert second.content == b""
+
+def test_player_stats_cache_dropped_after_game_result():
+    user_id = "test-user-9"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Cached"
+    }).json()["player_id"]
+    stats = client.get("/player-stats", params={"player_id": player_id}).json()
+    assert stats["games_played"] == 0
+    client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": player_id,
+            "score": 500,
+            "turns": 4,
+            "farkles": 1,
+            "won": True
+        }]
+    })
+    stats = client.get("/player-stats", params={"player_id": player_id}).json()
+    assert stats["games_played"] == 1
+
+def test_game_result_succeeds_when_cache_is_down(monkeypatch):
+    user_id = "test-user-10"
+    player_id = client.post("/create-player", json={
+        "user_id": user_id,
+        "display_name": "Offline"
+    }).json()["player_id"]
+
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("cache backend is down")
+
+    backend = FastAPICache.get_backend()
+    monkeypatch.setattr(backend, "set", unavailable)
+    monkeypatch.setattr(backend, "clear", unavailable)
+    res = client.post("/game-result", json={
+        "user_id": user_id,
+        "results": [{
+            "player_id": player_id,
+            "score": 700,
+            "turns": 6,
+            "farkles": 0,
+            "won": True
+        }]
+    })
+    assert res.status_code == 200
+    assert "game_id" in res.json()
+
+def test_requests_reuse_database_connections():
+    connects = []
+
+    def on_connect(dbapi_connection, connection_record):
+        connects.append(dbapi_connection)
+
+    event.listen(async_engine.sync_engine, "connect", on_connect)
+    try:
+        for _ in range(10):
+            # Each request reads the database: the stats of a missing player
+            # are never cached.
+            res = client.get("/player-stats", params={"player_id": str(uuid.uuid4())})
+            assert res.status_code == 404
+    finally:
+        event.remove(async_engine.sync_engine, "connect", on_connect)
+    assert len(connects) <= 1